@@ -9,23 +9,57 @@ Requires DEEPSEEK_API_KEY in env (optional DEEPSEEK_BASE_URL/DEEPSEEK_MODEL).
 from __future__ import annotations
 
 import argparse
+import asyncio
+import contextvars
+import functools
+import hashlib
 import importlib.util
+import itertools
 import json
+import locale
+import logging
+import multiprocessing
 import os
+import queue
+import sys
+import random
+import re
+import time
 import zipfile
-import xml.etree.ElementTree as ET
-from dataclasses import dataclass
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Callable, Optional
+from typing import Any, Awaitable, Dict, IO, Iterable, Iterator, List, Callable, Optional, Tuple
 
 try:
-    from openai import OpenAI
+    from openai import APIConnectionError, AsyncOpenAI, InternalServerError, RateLimitError
 except ImportError as exc:  # pragma: no cover - prompt user to install
     raise SystemExit("Missing dependency openai, install via: pip install openai") from exc
 
+try:  # optional: libxml2-backed parser is several times faster on large documents
+    from lxml import etree as ET
+
+    HAS_LXML = True
+except ImportError:  # pragma: no cover - fall back to the stdlib parser
+    import xml.etree.ElementTree as ET  # type: ignore[no-redef]
+
+    HAS_LXML = False
+
+try:  # optional: Rust-backed JSON codec, several times faster on large non-ASCII payloads
+    import orjson
+except ImportError:  # pragma: no cover - fall back to the stdlib json module
+    orjson = None  # type: ignore[assignment]
+
+logger = logging.getLogger("analyze_reports")
 
 ALLOWED_SUFFIXES = {".txt", ".md", ".docx"}
+DOCX_TEXT_TAG = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}t"
+DOCX_PARAGRAPH_TAG = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}p"
+DOCX_BODY_PART = "word/document.xml"
+DOCX_HEADER_FOOTER_PARTS = re.compile(r"word/(?:header|footer)\d*\.xml")
 MANAGER_HINTS = ("干部", "领导", "经理", "主管", "总监", "部长", "书记", "主任", "处长", "科长")
 INDUSTRY_CONTEXT = (
     "部门聚焦钢铁行业解决方案交付，场景涵盖生产、质量、计划、物流、成本、ERP/产品运营等。"
@@ -33,18 +67,30 @@ INDUSTRY_CONTEXT = (
     "质量做钢厂质量分析与质量设计；物流做钢厂物流功能；产品运营室类似 ERP；"
     "计划做钢厂生产计划；管理层为部门领导与管控。"
 )
-# 部门关键词 -> 提示词偏好
+# 部门关键词 -> (_JOB_WEIGHTS 岗位键, 提示词偏好)；按优先级排列，产品运营须排在产品之前
 DEPARTMENT_PROMPT_HINTS = [
-    (("研发", "技术", "工程", "开发"), "研发（前端/后端）：关注架构/核心模块、稳定性/缺陷率、性能指标、交付节奏、复用与技术债务。"),
-    (("产品", "产品经理"), "产品：关注需求测评、产品路线、共性能力沉淀、业务匹配度、交付与迭代节奏。"),
-    (("模型", "算法"), "模型算法：关注算法赋能、模型效果/覆盖、数据质量、算力成本、上线与迭代节奏。"),
-    (("质量", "质检", "测试"), "质量：关注缺陷发现率/漏检率、质量门禁、回归效率、工艺质量设计、风险预警。"),
-    (("物流", "供应链", "仓储"), "物流：关注交付准确率、响应时效、库存/成本效率、流程优化与数字化。"),
-    (("产品运营", "运营", "ERP"), "产品运营/ERP：关注流程覆盖、上线与运维、用户采用度、效率/成本改进。"),
-    (("计划", "PMO", "项目管理"), "计划/PMO：关注生产计划/资源调配、里程碑兑现、关键路径、风险管控与协同。"),
-    (("成本", "财务", "绩效"), "成本/绩效：关注成本节约、ROI、效率提升、财务合规、绩效改进。"),
-    (("管控", "综合管理", "外委", "管理层"), "管控/管理：关注流程制度、供应商/外协管理、风险与合规、资源统筹、组织保障。"),
+    (("研发", "技术", "工程", "开发"), "rd", "研发（前端/后端）：关注架构/核心模块、稳定性/缺陷率、性能指标、交付节奏、复用与技术债务。"),
+    (("产品运营", "运营", "ERP"), "operations", "产品运营/ERP：关注流程覆盖、上线与运维、用户采用度、效率/成本改进。"),
+    (("产品", "产品经理"), "product", "产品：关注需求测评、产品路线、共性能力沉淀、业务匹配度、交付与迭代节奏。"),
+    (("模型", "算法"), "algorithm", "模型算法：关注算法赋能、模型效果/覆盖、数据质量、算力成本、上线与迭代节奏。"),
+    (("质量", "质检", "测试"), "quality", "质量：关注缺陷发现率/漏检率、质量门禁、回归效率、工艺质量设计、风险预警。"),
+    (("物流", "供应链", "仓储"), "logistics", "物流：关注交付准确率、响应时效、库存/成本效率、流程优化与数字化。"),
+    (("计划", "PMO", "项目管理"), "planning", "计划/PMO：关注生产计划/资源调配、里程碑兑现、关键路径、风险管控与协同。"),
+    (("成本", "财务", "绩效"), "cost", "成本/绩效：关注成本节约、ROI、效率提升、财务合规、绩效改进。"),
+    (("管控", "综合管理", "外委", "管理层"), None, "管控/管理：关注流程制度、供应商/外协管理、风险与合规、资源统筹、组织保障。"),
 ]
+DEFAULT_DEPARTMENT_HINT = "关注年度成果、工作量、优势、改进点、跨部门支撑与风险。"
+# keyword tables compiled once into single-pass matchers
+MANAGER_PATTERN = re.compile("|".join(map(re.escape, MANAGER_HINTS)))
+# built in reverse so a keyword listed under several hints keeps its highest-priority rank
+DEPARTMENT_KEYWORD_RANK: Dict[str, int] = {
+    keyword.lower(): rank
+    for rank, (keywords, *_) in reversed(list(enumerate(DEPARTMENT_PROMPT_HINTS)))
+    for keyword in keywords
+}
+DEPARTMENT_PATTERN = re.compile(
+    "(?=(" + "|".join(map(re.escape, sorted(DEPARTMENT_KEYWORD_RANK, key=DEPARTMENT_KEYWORD_RANK.get))) + "))"
+)
 
 
 @dataclass
@@ -53,33 +99,107 @@ class Report:
     department: str
     title: str
     role: str
-    content: str
+    # a plain per-instance slot rather than functools.cached_property, whose lock (Python < 3.12)
+    # is shared by every Report and would serialize loads running on different threads
+    _content: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+
+    @property
+    def content(self) -> str:
+        """Loaded from disk on first access; release() drops it once the report is summarized."""
+        if self._content is None:
+            self._content = load_content(self.path)
+        return self._content
+
+    @content.setter
+    def content(self, value: str) -> None:
+        self._content = value
+
+    def release(self) -> None:
+        self._content = None
+
+
+def json_loads(text: str | bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def json_dumps(data: Any, indent: bool = False) -> str:
+    """Serialize to a JSON string with non-ASCII kept as-is (orjson when available)."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0).decode("utf-8")
+        except TypeError:  # e.g. integers beyond 64 bits, which the stdlib still handles
+            pass
+    return json.dumps(data, ensure_ascii=False, indent=2 if indent else None)
+
+
+def write_json(dest: Path, data: Any) -> None:
+    """Write indented JSON; orjson encodes straight to bytes, the stdlib streams into the file."""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if orjson is not None:
+        try:
+            dest.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+            return
+        except TypeError:
+            pass
+    with dest.open("w", encoding="utf-8") as fp:
+        json.dump(data, fp, ensure_ascii=False, indent=2)
 
 
 def read_text_file(path: Path) -> str:
-    """Try common encodings to read a text/markdown file."""
+    """Try common encodings to read a text/markdown file; the bytes are read from disk once."""
+    data = path.read_bytes()
     for enc in ("utf-8", "utf-8-sig", "gbk", "cp936"):
         try:
-            return path.read_text(encoding=enc)
+            text = data.decode(enc)
+            break
         except UnicodeDecodeError:
             continue
-    return path.read_text(errors="ignore")
+    else:
+        text = data.decode(locale.getpreferredencoding(False), errors="ignore")
+    # match Path.read_text's universal-newline translation
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def iter_docx_text(fh: IO[bytes]) -> Iterator[str]:
+    """Yield w:t texts from one docx XML part, releasing parsed nodes as it goes."""
+    if HAS_LXML:
+        # lxml filters tags natively, so only w:t/w:p elements are surfaced; finished paragraphs
+        # and their already-consumed siblings are dropped to keep the partial tree small.
+        events = ET.iterparse(fh, events=("end",), tag=(DOCX_TEXT_TAG, DOCX_PARAGRAPH_TAG), resolve_entities=False)
+        for _, elem in events:
+            if elem.tag == DOCX_TEXT_TAG:
+                if elem.text:
+                    yield elem.text
+                continue
+            elem.clear(keep_tail=False)
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+        return
+    for _, elem in ET.iterparse(fh, events=("end",)):
+        if elem.tag == DOCX_TEXT_TAG and elem.text:
+            yield elem.text
+        elem.clear()
 
 
 def read_docx_file(path: Path) -> str:
-    """Lightweight docx parser to extract text from w:t tags."""
+    """Lightweight docx parser to extract text from w:t tags.
+
+    Parts are streamed through iterparse and cleared as they are consumed, so memory
+    stays bounded regardless of document.xml size.
+    """
     texts: List[str] = []
     with zipfile.ZipFile(path) as zf:
-        namelist = [name for name in zf.namelist() if name.startswith("word/") and name.endswith(".xml")]
-        for name in namelist:
-            if not any(key in name for key in ("document", "header", "footer")):
+        # the body part is looked up by name; only header/footer parts need a namelist scan
+        names = [DOCX_BODY_PART] + [name for name in zf.namelist() if DOCX_HEADER_FOOTER_PARTS.fullmatch(name)]
+        for name in names:
+            try:
+                fh = zf.open(name)
+            except KeyError:
                 continue
-            xml_bytes = zf.read(name)
-            root = ET.fromstring(xml_bytes)
-            ns = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
-            for node in root.iter(ns + "t"):
-                if node.text:
-                    texts.append(node.text)
+            with fh:
+                texts.extend(iter_docx_text(fh))
     return "\n".join(texts)
 
 
@@ -91,7 +211,7 @@ def load_content(path: Path) -> str:
         try:
             return read_docx_file(path)
         except zipfile.BadZipFile:
-            print(f"[警告] {path} 不是有效的 docx，尝试按文本读取")
+            logger.warning("[警告] %s 不是有效的 docx，尝试按文本读取", path)
             return read_text_file(path)
     raise ValueError(f"不支持的文件类型: {path.suffix}")
 
@@ -112,19 +232,27 @@ def load_env_from_file(file_path: Path) -> None:
 
 
 def detect_role(title: str) -> str:
-    return "cadre" if any(key in title for key in MANAGER_HINTS) else "employee"
+    return "cadre" if MANAGER_PATTERN.search(title) else "employee"
 
 
-def department_focus(department: str) -> str:
-    dept_lower = department.lower()
-    for keywords, hint in DEPARTMENT_PROMPT_HINTS:
-        if any(k.lower() in dept_lower for k in keywords):
-            return hint
-    return "关注年度成果、工作量、优势、改进点、跨部门支撑与风险。"
+def classify_department(department: str) -> Tuple[Optional[str], str]:
+    """(job type, focus hint) for a department folder, from the single DEPARTMENT_PROMPT_HINTS table."""
+    # the lookahead reports a match at every position, so overlapping keywords are all seen;
+    # alternatives are ordered by hint priority, and the lowest-ranked hit wins
+    ranks = [DEPARTMENT_KEYWORD_RANK[m.group(1)] for m in DEPARTMENT_PATTERN.finditer(department.lower())]
+    if ranks:
+        _, job_type, hint = DEPARTMENT_PROMPT_HINTS[min(ranks)]
+        return job_type, hint
+    return None, DEFAULT_DEPARTMENT_HINT
 
 
+@functools.lru_cache(maxsize=32)
 def load_prompt_builder(module_name: str, func_name: str = "build_prompt") -> Optional[Callable[..., str]]:
-    """Dynamically load a prompt builder from module.func if present; return None on failure."""
+    """Dynamically load a prompt builder from module.func if present; return None on failure.
+
+    Results are memoized so a batch executes each prompt module once; main() clears the
+    cache at the start of every run so edited prompts are picked up by long-lived callers.
+    """
     spec = importlib.util.find_spec(module_name)
     if spec is None or spec.loader is None:
         parts = module_name.split(".")
@@ -205,6 +333,7 @@ def normalize_summary(report: Report, data: Dict[str, Any]) -> Dict[str, Any]:
 
 
 def collect_reports(root: Path) -> List[Report]:
+    """List report descriptors; content is loaded lazily by each worker (see Report.content)."""
     reports: List[Report] = []
     for file_path in sorted(root.rglob("*")):
         if not file_path.is_file() or file_path.suffix.lower() not in ALLOWED_SUFFIXES:
@@ -213,24 +342,292 @@ def collect_reports(root: Path) -> List[Report]:
         department = relative.parts[0] if len(relative.parts) > 1 else "未分类"
         title = file_path.stem
         role = detect_role(title)
-        content = load_content(file_path)
-        reports.append(Report(path=file_path, department=department, title=title, role=role, content=content))
+        reports.append(Report(path=file_path, department=department, title=title, role=role))
     return reports
 
 
-def create_client() -> OpenAI:
+def create_client() -> AsyncOpenAI:
     api_key = os.getenv("DEEPSEEK_API_KEY")
     if not api_key:
         raise SystemExit("请先在环境变量中设置 DEEPSEEK_API_KEY")
     base_url = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
-    return OpenAI(api_key=api_key, base_url=base_url)
+    # retries are handled by request_completion so backoff and rate limiting stay in one place
+    return AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+
+
+# CJK ideographs, kana, hangul and full-width punctuation: DeepSeek's tokenizer spends ~0.6 tokens on each,
+# so they are counted as a whole token (upper bound); everything else as ~3 chars per token
+CJK_PATTERN = re.compile(r"[\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Conservative token estimate: one token per CJK character, ~3 characters per token otherwise."""
+    cjk = len(CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 2) // 3
+
+
+def prefix_within_tokens(text: str, budget_tokens: int) -> int:
+    """Length of the longest prefix of text whose estimate_tokens-style cost fits in budget_tokens."""
+    # cost in thirds of a token, so ASCII and CJK characters can be summed as integers
+    remaining = budget_tokens * 3
+    for i, ch in enumerate(text):
+        remaining -= 3 if CJK_PATTERN.match(ch) else 1
+        if remaining < 0:
+            return i
+    return len(text)
+
+
+ELISION_MARKER = "\n\n……（中间约 {omitted} 字因超出上下文长度已省略）……\n\n"
+
+
+def truncate_to_tokens(text: str, budget_tokens: int) -> str:
+    """Head/tail-truncate text to at most budget_tokens (marker included), keeping the opening 3/4 and closing 1/4."""
+    if estimate_tokens(text) <= budget_tokens:
+        return text
+    # the marker's own cost, with the widest possible count; +2 covers rounding in the two kept parts
+    content_budget = max(0, budget_tokens - estimate_tokens(ELISION_MARKER.format(omitted=len(text))) - 2)
+    head_budget = content_budget * 3 // 4
+    head = prefix_within_tokens(text, head_budget)
+    tail = prefix_within_tokens(text[::-1], content_budget - head_budget)
+    omitted = len(text) - head - tail
+    return text[:head] + ELISION_MARKER.format(omitted=omitted) + text[len(text) - tail :]
+
+
+class RateLimiter:
+    """Token buckets for requests-per-minute and tokens-per-minute; a limit of 0 disables that bucket."""
+
+    def __init__(self, rpm: int, tpm: int) -> None:
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rpm > 0:
+            self._requests = min(float(self.rpm), self._requests + elapsed * self.rpm / 60)
+        if self.tpm > 0:
+            self._tokens = min(float(self.tpm), self._tokens + elapsed * self.tpm / 60)
+
+    async def acquire(self, estimated_tokens: int) -> None:
+        """Wait until one request and `estimated_tokens` fit in the buckets, then consume them."""
+        # a single request larger than the whole TPM budget would otherwise wait forever
+        need = min(estimated_tokens, self.tpm) if self.tpm > 0 else 0
+        async with self._lock:
+            while True:
+                self._refill()
+                wait = 0.0
+                if self.rpm > 0 and self._requests < 1:
+                    wait = max(wait, (1 - self._requests) * 60 / self.rpm)
+                if self.tpm > 0 and self._tokens < need:
+                    wait = max(wait, (need - self._tokens) * 60 / self.tpm)
+                if wait <= 0:
+                    if self.rpm > 0:
+                        self._requests -= 1
+                    if self.tpm > 0:
+                        self._tokens -= need
+                    return
+                await asyncio.sleep(wait)
+
+
+@dataclass
+class UsageTotals:
+    """Token usage summed over a run; cache_hit_tokens is DeepSeek's prompt_cache_hit_tokens (prefix cache)."""
+
+    prompt_tokens: int = 0
+    cache_hit_tokens: int = 0
+    completion_tokens: int = 0
+
+    def record(self, completion: Any) -> None:
+        usage = getattr(completion, "usage", None)
+        if usage is None:
+            return
+        self.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+        self.cache_hit_tokens += getattr(usage, "prompt_cache_hit_tokens", 0) or 0
+        self.completion_tokens += getattr(usage, "completion_tokens", 0) or 0
+
+
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+# JSON mode for the individual stage: the server constrains decoding to a single JSON object
+JSON_RESPONSE_FORMAT: Dict[str, str] = {"type": "json_object"}
+# extra output budget for the one retry after an unparseable (usually cut-off) JSON reply
+JSON_RETRY_EXTRA_TOKENS = 256
 
 
-def summarize_individual(
-    client: OpenAI, model: str, report: Report, temperature: float, max_tokens: int
+async def request_completion(
+    client: AsyncOpenAI,
+    limiter: Optional[RateLimiter],
+    max_attempts: int,
+    *,
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    max_tokens: int,
+    usage: Optional[UsageTotals] = None,
+    response_format: Optional[Dict[str, str]] = None,
+) -> Any:
+    """Call chat.completions under the rate limiter, retrying transient errors with exponential backoff."""
+    estimated = sum(estimate_tokens(m["content"]) for m in messages) + max_tokens
+    extra: Dict[str, Any] = {"response_format": response_format} if response_format else {}
+    attempts = max(1, max_attempts)
+    for attempt in range(attempts):
+        if limiter is not None:
+            await limiter.acquire(estimated)
+        try:
+            completion = await client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                **extra,
+            )
+        except RETRYABLE_ERRORS as exc:
+            if attempt + 1 >= attempts:
+                raise
+            delay = min(60.0, 2**attempt + random.random())
+            logger.warning("[重试] %s，%.1fs 后第 %d/%d 次尝试", type(exc).__name__, delay, attempt + 2, attempts)
+            await asyncio.sleep(delay)
+            continue
+        if usage is not None:
+            usage.record(completion)
+        return completion
+    raise RuntimeError("unreachable")
+
+
+def cache_key(model: str, temperature: float, sys_prompt: str, user_prompt: str) -> str:
+    payload = f"{model}|{temperature:.3f}|{sys_prompt}|{user_prompt}".encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def cache_path(cache_dir: Path, key: str) -> Path:
+    # shard by key prefix so a long-lived cache does not pile thousands of files into one directory
+    return cache_dir / key[:2] / f"{key}.json"
+
+
+def cache_get(cache_dir: Path, key: str) -> Optional[Dict[str, Any]]:
+    """Return the cached model output for key, or None on miss/corruption."""
+    try:
+        return json_loads(cache_path(cache_dir, key).read_bytes())
+    except (OSError, ValueError):
+        return None
+
+
+def cache_put(cache_dir: Path, key: str, data: Dict[str, Any]) -> None:
+    """Store model output atomically so concurrent or interrupted runs never see partial files."""
+    dest = cache_path(cache_dir, key)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f"{dest.name}.{os.getpid()}.{id(data)}.tmp")
+    tmp.write_text(json_dumps(data), encoding="utf-8")
+    os.replace(tmp, dest)
+
+
+async def share_result(
+    inflight: Dict[str, "asyncio.Future[Any]"],
+    key: str,
+    call: Callable[[], Awaitable[Any]],
+) -> Any:
+    """Run `call` once per key; other callers with the same key, concurrent or later, share its outcome."""
+    leader = inflight.get(key)
+    if leader is not None:
+        # shield: a cancelled follower must not cancel the leader's future for everyone else
+        return await asyncio.shield(leader)
+    leader = inflight[key] = asyncio.get_running_loop().create_future()
+    try:
+        result = await call()
+    except Exception as exc:
+        leader.set_exception(exc)
+        leader.exception()  # retrieved here, so a leader without followers logs no "never retrieved" warning
+        raise
+    except BaseException:
+        leader.cancel()
+        raise
+    leader.set_result(result)
+    return result
+
+
+# fields the model tends to copy from the per-file metadata in the prompt (file title, folder, role guess);
+# a report reusing another report's extraction drops them and falls back to its own Report values
+FILE_IDENTITY_FIELDS = ("name", "title", "department", "role")
+
+
+def dedup_key(report: Report) -> str:
+    """Key for sharing one extraction: identical content plus the prompt inputs that change its guidance."""
+    digest = hashlib.sha256()
+    for part in (report.department, report.role):
+        digest.update(part.encode("utf-8") + b"\0")
+    digest.update(report.content.encode("utf-8"))
+    return digest.hexdigest()
+
+
+async def summarize_individual(
+    client: AsyncOpenAI,
+    model: str,
+    report: Report,
+    temperature: float,
+    max_tokens: int,
+    limiter: Optional[RateLimiter] = None,
+    max_attempts: int = 1,
+    cache_dir: Optional[Path] = None,
+    context_limit: Optional[int] = None,
+    usage: Optional[UsageTotals] = None,
+    inflight: Optional[Dict[str, "asyncio.Future[Any]"]] = None,
+    refresh_cache: bool = False,
 ) -> Dict[str, Any]:
-    """Call DeepSeek to produce a structured summary for one report."""
-    dept_hint = department_focus(report.department)
+    """Call DeepSeek to produce a structured summary for one report.
+
+    With `inflight` (one dict per run), reports with byte-identical content in the same department,
+    role and job type share one model call (see dedup_key). The reusing report drops the
+    FILE_IDENTITY_FIELDS of the shared answer, so its name/title/department/role come from its own file.
+    """
+    extract = functools.partial(
+        extract_individual,
+        client,
+        model,
+        report,
+        temperature,
+        max_tokens,
+        limiter=limiter,
+        max_attempts=max_attempts,
+        cache_dir=cache_dir,
+        context_limit=context_limit,
+        usage=usage,
+        refresh_cache=refresh_cache,
+    )
+    if inflight is None:
+        data = await extract()
+    else:
+        key = dedup_key(report)
+        reused = key in inflight
+        if reused:
+            logger.info("[信息] %s 与已提交的总结内容相同，复用同一次提炼结果", report.path)
+        data = await share_result(inflight, key, extract)
+        if reused and isinstance(data, dict):
+            data = {k: v for k, v in data.items() if k not in FILE_IDENTITY_FIELDS}
+    return normalize_summary(report, data)
+
+
+async def extract_individual(
+    client: AsyncOpenAI,
+    model: str,
+    report: Report,
+    temperature: float,
+    max_tokens: int,
+    limiter: Optional[RateLimiter] = None,
+    max_attempts: int = 1,
+    cache_dir: Optional[Path] = None,
+    context_limit: Optional[int] = None,
+    usage: Optional[UsageTotals] = None,
+    refresh_cache: bool = False,
+) -> Dict[str, Any]:
+    """Build the prompts for one report and return the model's parsed JSON (before normalize_summary).
+
+    refresh_cache skips the cache lookup but still stores the fresh answer under cache_dir.
+    """
+    job_type, dept_hint = classify_department(report.department)
     sys_prompt = (
         "You are an HR/Org design expert. Extract concise, decision-grade facts from the annual report. "
         "Respond ONLY with the required JSON object in Chinese, no extra text."
@@ -238,7 +635,9 @@ def summarize_individual(
     sys_prompt_builder = load_prompt_builder("prompts.individual.prompt", "build_system_prompt")
     if sys_prompt_builder:
         try:
-            sys_prompt = sys_prompt_builder({"industry_context": INDUSTRY_CONTEXT, "department_focus": dept_hint})
+            sys_prompt = sys_prompt_builder(
+                {"industry_context": INDUSTRY_CONTEXT, "department_focus": dept_hint}
+            )
         except Exception:
             pass
     sys_prompt = (
@@ -250,97 +649,158 @@ def summarize_individual(
         + "support_to_departments(list), risk_flags(list), tags(list)。不要输出 Markdown 或额外文字。"
     )
     prompt_builder = load_prompt_builder("prompts.individual.prompt")
-    if prompt_builder:
-        try:
-            user_prompt = prompt_builder(
-                {
-                    "industry_context": INDUSTRY_CONTEXT,
-                    "department_focus": dept_hint,
-                    "report": report,
-                    "raw_content": report.content,
-                }
+
+    def render_user_prompt(content: str) -> str:
+        if prompt_builder:
+            try:
+                return prompt_builder(
+                    {
+                        "industry_context": INDUSTRY_CONTEXT,
+                        "department_focus": dept_hint,
+                        "job_type": job_type,
+                        "report": report,
+                        "raw_content": content,
+                    }
+                )
+            except Exception:
+                pass
+        return content
+
+    raw_content = report.content
+    if context_limit:
+        # the template around the content varies per report (job-focus block, metadata), so measure it
+        template_tokens = estimate_tokens(render_user_prompt(""))
+        # the JSON re-ask below asks for JSON_RETRY_EXTRA_TOKENS more output; it must fit the window too
+        output_ceiling = max_tokens + JSON_RETRY_EXTRA_TOKENS
+        budget = context_limit - output_ceiling - estimate_tokens(sys_prompt) - template_tokens
+        if budget <= 0:
+            raise RuntimeError(
+                f"上下文预算不足：context_limit={context_limit} 小于 max_tokens、system prompt 与 user prompt 模板之和"
             )
-        except Exception:
-            user_prompt = report.content
-    else:
-        user_prompt = report.content
-    try:
-        completion = client.chat.completions.create(
-            model=model,
-            messages=[{"role": "system", "content": sys_prompt}, {"role": "user", "content": user_prompt}],
-            temperature=temperature,
-            max_tokens=max_tokens,
-        )
-    except Exception as exc:
-        raise RuntimeError(f"调用模型失败: {exc}") from exc
-    content = completion.choices[0].message.content if completion.choices else None
-    if not content:
-        raise RuntimeError("模型未返回内容")
-    try:
-        data = json.loads(content)
-    except Exception:
-        cleaned = content.strip()
-        cleaned = cleaned.replace("```json", "").replace("```", "").strip()
+        raw_content = truncate_to_tokens(raw_content, budget)
+        if raw_content is not report.content:
+            logger.warning(
+                "[警告] %s 内容过长（约 %d tokens），已截断至约 %d tokens",
+                report.path,
+                estimate_tokens(report.content),
+                budget,
+            )
+    user_prompt = render_user_prompt(raw_content)
+    key = cache_key(model, temperature, sys_prompt, user_prompt) if cache_dir is not None else None
+    if key is not None and not refresh_cache:
+        cached = await asyncio.to_thread(cache_get, cache_dir, key)
+        if cached is not None:
+            return cached
+    messages = [{"role": "system", "content": sys_prompt}, {"role": "user", "content": user_prompt}]
+    # a reply that fails to parse was usually cut off at max_tokens: retry once with a little more room
+    for attempt_max_tokens in (max_tokens, max_tokens + JSON_RETRY_EXTRA_TOKENS):
         try:
-            data = json.loads(cleaned)
+            completion = await request_completion(
+                client,
+                limiter,
+                max_attempts,
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=attempt_max_tokens,
+                usage=usage,
+                response_format=JSON_RESPONSE_FORMAT,
+            )
         except Exception as exc:
-            raise RuntimeError(f"无法解析模型返回的 JSON: {exc}; content={content}") from exc
-    return normalize_summary(report, data)
+            raise RuntimeError(f"调用模型失败: {exc}") from exc
+        content = completion.choices[0].message.content if completion.choices else None
+        if not content:
+            raise RuntimeError("模型未返回内容")
+        try:
+            data = json_loads(content)
+            break
+        except Exception:
+            cleaned = content.strip()
+            cleaned = cleaned.replace("```json", "").replace("```", "").strip()
+            try:
+                data = json_loads(cleaned)
+                break
+            except Exception as exc:
+                if attempt_max_tokens != max_tokens:
+                    raise RuntimeError(f"无法解析模型返回的 JSON: {exc}; content={content}") from exc
+                logger.warning(
+                    "[重试] %s 返回的 JSON 无法解析，max_tokens 放宽至 %d 后重试",
+                    report.path,
+                    max_tokens + JSON_RETRY_EXTRA_TOKENS,
+                )
+    if key is not None and isinstance(data, dict):
+        await asyncio.to_thread(cache_put, cache_dir, key, data)
+    return data
+
+
+# fields passed to the aggregate prompt, with the default used when a summary lacks one;
+# () marks list fields, which get a fresh empty list
+AGGREGATE_FIELDS: Tuple[Tuple[str, Any], ...] = (
+    ("name", None),
+    ("department", None),
+    ("role", None),
+    ("position", None),
+    ("title", None),
+    ("entry_date", None),
+    ("work_scope", ""),
+    ("key_results", ()),
+    ("capability_profile", ()),
+    ("methodologies", ()),
+    ("strengths", ()),
+    ("improvements", ()),
+    ("self_review", ()),
+    ("issues", ()),
+    ("suggestions", ()),
+    ("workload", None),
+    ("support_to_departments", ()),
+    ("risk_flags", ()),
+    ("tags", ()),
+    ("error", None),
+)
+
+
+def project_person(person: Dict[str, Any]) -> Dict[str, Any]:
+    """Project a summary onto AGGREGATE_FIELDS (drops source_path and unknown keys)."""
+    return {
+        key: person[key] if key in person else (list(default) if isinstance(default, tuple) else default)
+        for key, default in AGGREGATE_FIELDS
+    }
 
 
 def build_aggregate_prompt(
     people: Iterable[Dict[str, Any]],
     extra_prompt: str | None,
 ) -> str:
-    compact: List[Dict[str, Any]] = []
-    for person in people:
-        compact.append(
-            {
-                "name": person.get("name"),
-                "department": person.get("department"),
-                "role": person.get("role"),
-                "position": person.get("position"),
-                "title": person.get("title"),
-                "entry_date": person.get("entry_date"),
-                "work_scope": person.get("work_scope", ""),
-                "key_results": person.get("key_results", []),
-                "capability_profile": person.get("capability_profile", []),
-                "methodologies": person.get("methodologies", []),
-                "strengths": person.get("strengths", []),
-                "improvements": person.get("improvements", []),
-                "self_review": person.get("self_review", []),
-                "issues": person.get("issues", []),
-                "suggestions": person.get("suggestions", []),
-                "workload": person.get("workload"),
-                "support_to_departments": person.get("support_to_departments", []),
-                "risk_flags": person.get("risk_flags", []),
-                "tags": person.get("tags", []),
-                "error": person.get("error"),
-            }
-        )
-    people_json = json.dumps(compact, ensure_ascii=False, indent=2)
-    extra = extra_prompt.strip() if extra_prompt else ""
+    compact = [project_person(person) for person in people]
     prompt_builder = load_prompt_builder("prompts.aggregate.prompt")
     if prompt_builder:
         try:
             return prompt_builder({"people": compact, "industry_context": INDUSTRY_CONTEXT})
         except Exception:
             pass
-    return (
-        f"Industry background: {INDUSTRY_CONTEXT}\n\n"
-        f"Structured individual summaries:\n{people_json}\n\n"
-        f"Additional context: {extra or 'None'}\n"
-        f"Please generate the organization report per the system prompt requirements."
+    # only the built-in fallback needs the serialized list
+    extra = extra_prompt.strip() if extra_prompt else ""
+    return "".join(
+        (
+            f"Industry background: {INDUSTRY_CONTEXT}\n\n",
+            "Structured individual summaries:\n",
+            json_dumps(compact, indent=True),
+            f"\n\nAdditional context: {extra or 'None'}\n",
+            "Please generate the organization report per the system prompt requirements.",
+        )
     )
 
 
-def aggregate_review(
-    client: OpenAI,
+async def aggregate_review(
+    client: AsyncOpenAI,
     model: str,
     people: List[Dict[str, Any]],
     temperature: float,
     extra_prompt: str | None,
     max_tokens: int,
+    limiter: Optional[RateLimiter] = None,
+    max_attempts: int = 1,
+    usage: Optional[UsageTotals] = None,
 ) -> str:
     user_prompt = build_aggregate_prompt(people, extra_prompt)
     sys_prompt = "You are an organizational strategy consultant focusing on steel-industry solutions. Respond in Chinese with concise, actionable analysis."
@@ -351,7 +811,10 @@ def aggregate_review(
         except Exception:
             pass
     try:
-        completion = client.chat.completions.create(
+        completion = await request_completion(
+            client,
+            limiter,
+            max_attempts,
             model=model,
             messages=[
                 {"role": "system", "content": sys_prompt},
@@ -359,6 +822,7 @@ def aggregate_review(
             ],
             temperature=temperature,
             max_tokens=max_tokens,
+            usage=usage,
         )
     except Exception as exc:
         raise RuntimeError(f"调用模型失败: {exc}") from exc
@@ -395,111 +859,327 @@ def make_failure_record(report: Report, error: str) -> Dict[str, Any]:
     }
 
 
-def main(argv: List[str] | None = None) -> None:
+async def process_report(
+    sem: asyncio.Semaphore,
+    client: AsyncOpenAI,
+    limiter: RateLimiter,
+    cfg: AnalyzeConfig,
+    report: Report,
+    idx: int,
+    total: int,
+    per_report_dir: Path,
+    parse_pool: Optional[Executor] = None,
+    usage: Optional[UsageTotals] = None,
+    inflight: Optional[Dict[str, "asyncio.Future[Any]"]] = None,
+) -> Tuple[int, Dict[str, Any]]:
+    """Summarize one report under the concurrency limit and write its per-report JSON; returns (idx, summary)."""
+    async with sem:
+        logger.info("[%d/%d] 处理 %s ...", idx, total, report.path)
+        try:
+            # load off the event loop; the semaphore bounds both concurrent parsing and resident content
+            if parse_pool is None:
+                report.content = await asyncio.to_thread(load_content, report.path)
+            else:
+                # docx XML parsing is CPU-bound, so with worker processes it runs on several cores
+                loop = asyncio.get_running_loop()
+                report.content = await loop.run_in_executor(parse_pool, load_content, report.path)
+            summary = await summarize_individual(
+                client,
+                cfg.model,
+                report,
+                cfg.temperature,
+                cfg.max_tokens_individual,
+                limiter=limiter,
+                max_attempts=cfg.max_attempts,
+                cache_dir=None if cfg.no_cache else cfg.cache_dir,
+                refresh_cache=cfg.refresh_cache,
+                context_limit=cfg.context_limit,
+                usage=usage,
+                inflight=inflight,
+            )
+        except Exception as exc:
+            logger.error("[错误] 提炼失败: %s -> %s", report.path, exc)
+            summary = make_failure_record(report, str(exc))
+        finally:
+            report.release()
+    dest = per_report_dir / report.path.relative_to(cfg.input_dir).with_suffix(".json")
+    try:
+        await asyncio.to_thread(write_json, dest, summary)
+    except Exception as exc:
+        logger.error("[错误] 写入失败: %s -> %s", dest, exc)
+    return idx, summary
+
+
+class CallbackHandler(logging.Handler):
+    """Hand each formatted record (newline-terminated) to a progress callback."""
+
+    def __init__(self, callback: Callable[[str], None]) -> None:
+        super().__init__()
+        self.callback = callback
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.callback(self.format(record) + "\n")
+        except Exception:
+            self.handleError(record)
+
+
+# id of the run whose context a log record is emitted from; asyncio tasks and to_thread workers
+# inherit it, so concurrent runs in one process (the web UI) each only see their own records
+_RUN_ID: "contextvars.ContextVar[Optional[int]]" = contextvars.ContextVar("analyze_reports_run_id", default=None)
+_RUN_IDS = itertools.count(1)
+
+
+@contextmanager
+def queued_logging(progress: Optional[Callable[[str], None]] = None) -> Iterator[None]:
+    """Send this module's log records through a queue; a listener thread formats and writes them.
+
+    Workers only enqueue, so progress output never blocks the event loop on stdout. With a
+    progress callback the records go to it instead of stdout. Only records emitted from this
+    run's context (see _RUN_ID) are picked up.
+    """
+    run_id = next(_RUN_IDS)
+    token = _RUN_ID.set(run_id)
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    # filters run in the emitting thread, where the run's context is visible
+    queue_handler.addFilter(lambda record: _RUN_ID.get() == run_id)
+    output_handler: logging.Handler = CallbackHandler(progress) if progress else logging.StreamHandler(sys.stdout)
+    output_handler.setFormatter(logging.Formatter("%(message)s"))
+    listener = QueueListener(log_queue, output_handler)
+    logger.addHandler(queue_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    listener.start()
+    try:
+        yield
+    finally:
+        listener.stop()
+        logger.removeHandler(queue_handler)
+        _RUN_ID.reset(token)
+
+
+def env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+@dataclass
+class AnalyzeConfig:
+    """Settings for one run; main() fills it from argv, the web UI builds it directly."""
+
+    input_dir: Path
+    out_dir: Path = Path("analysis_output")
+    model: str = field(default_factory=lambda: os.getenv("DEEPSEEK_MODEL", "deepseek-chat"))
+    aggregate_model: str = field(default_factory=lambda: os.getenv("DEEPSEEK_AGG_MODEL", "deepseek-reasoner"))
+    temperature: float = 1.3
+    max_tokens_individual: int = 8000
+    max_tokens_aggregate: int = 64000
+    env_file: Path = Path(".env")
+    plan_prompt: Optional[str] = None
+    concurrency: int = field(default_factory=lambda: env_int("DEEPSEEK_CONCURRENCY", 16))
+    max_requests_per_minute: int = field(default_factory=lambda: env_int("DEEPSEEK_MAX_RPM", 0))
+    max_tokens_per_minute: int = field(default_factory=lambda: env_int("DEEPSEEK_MAX_TPM", 0))
+    max_attempts: int = field(default_factory=lambda: env_int("DEEPSEEK_MAX_ATTEMPTS", 5))
+    cache_dir: Path = Path("llm_cache")
+    no_cache: bool = False
+    refresh_cache: bool = False
+    context_limit: int = field(default_factory=lambda: env_int("DEEPSEEK_CONTEXT_LIMIT", 64000))
+    parse_workers: int = field(default_factory=lambda: env_int("DEEPSEEK_PARSE_WORKERS", 0))
+
+
+def main(argv: List[str] | None = None, progress: Optional[Callable[[str], None]] = None) -> None:
+    # one source of defaults: the dataclass (its env-backed fields are read here, at parse time)
+    defaults = AnalyzeConfig(input_dir=Path())
     parser = argparse.ArgumentParser(description="对多个年终总结生成个人/部门/公司评价（DeepSeek 驱动）")
-    parser.add_argument("--input", required=True, type=Path, help="存放各部门年终总结的根目录")
-    parser.add_argument("--out-dir", default=Path("analysis_output"), type=Path, help="输出结果目录")
-    parser.add_argument("--model", default=os.getenv("DEEPSEEK_MODEL", "deepseek-chat"), help="个人提炼模型")
+    parser.add_argument("--input", dest="input_dir", metavar="INPUT", required=True, type=Path, help="存放各部门年终总结的根目录")
+    parser.add_argument("--out-dir", default=defaults.out_dir, type=Path, help="输出结果目录")
+    parser.add_argument("--model", default=defaults.model, help="个人提炼模型")
     parser.add_argument(
         "--aggregate-model",
-        default=os.getenv("DEEPSEEK_AGG_MODEL", "deepseek-reasoner"),
-        help="最终汇总使用的模型（默认 deepseek-reasoner）",
+        default=defaults.aggregate_model,
+        help="最终汇总使用的模型（默认 %(default)s）",
     )
     parser.add_argument(
         "--temperature",
-        default=1.3,
+        default=defaults.temperature,
         type=float,
-        help="采样温度，个人提炼与最终汇总共用（默认 1.3）",
+        help="采样温度，个人提炼与最终汇总共用（默认 %(default)s）",
     )
     parser.add_argument(
         "--max-tokens-individual",
-        default=8000,
+        default=defaults.max_tokens_individual,
         type=int,
-        help="个人提炼阶段的 max_tokens（默认 4000，可在 4000-8000 调整）",
+        help="个人提炼阶段的 max_tokens（默认 %(default)s，可在 4000-8000 调整）",
     )
     parser.add_argument(
         "--max-tokens-aggregate",
-        default=64000,
+        default=defaults.max_tokens_aggregate,
         type=int,
-        help="汇总阶段的 max_tokens（默认 32000，可在 32000-64000 调整）",
+        help="汇总阶段的 max_tokens（默认 %(default)s，可在 32000-64000 调整）",
     )
-    parser.add_argument("--env-file", default=Path(".env"), type=Path, help="包含 DEEPSEEK_API_KEY 的 .env 路径")
+    parser.add_argument("--env-file", default=defaults.env_file, type=Path, help="包含 DEEPSEEK_API_KEY 的 .env 路径")
     parser.add_argument(
         "--plan-prompt",
-        default=None,
+        default=defaults.plan_prompt,
         type=str,
         help="年初计划/指标等额外提示内容（直接文本，追加到汇总提示中）",
     )
+    parser.add_argument(
+        "--concurrency",
+        default=defaults.concurrency,
+        type=int,
+        help="个人提炼阶段的并发请求数（默认 %(default)s，可用 DEEPSEEK_CONCURRENCY 覆盖）",
+    )
+    parser.add_argument(
+        "--max-requests-per-minute",
+        default=defaults.max_requests_per_minute,
+        type=int,
+        help="每分钟请求数上限（默认取 DEEPSEEK_MAX_RPM，0 表示不限）",
+    )
+    parser.add_argument(
+        "--max-tokens-per-minute",
+        default=defaults.max_tokens_per_minute,
+        type=int,
+        help="每分钟 token 上限（按输入估算 + max_tokens 计，默认取 DEEPSEEK_MAX_TPM，0 表示不限）",
+    )
+    parser.add_argument(
+        "--max-attempts",
+        default=defaults.max_attempts,
+        type=int,
+        help="限流/连接/服务端错误时的最大尝试次数（指数退避，默认 %(default)s）",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=defaults.cache_dir,
+        type=Path,
+        help="个人提炼结果缓存目录（按 模型+温度+提示词 哈希命中，命中时不再调用 API）",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="不读写个人提炼缓存，强制重新调用模型")
+    parser.add_argument(
+        "--refresh-cache",
+        action="store_true",
+        help="忽略已有缓存、重新调用模型，并用新结果覆盖缓存（与 --no-cache 不同，结果仍会写入）",
+    )
+    parser.add_argument(
+        "--context-limit",
+        default=defaults.context_limit,
+        type=int,
+        help="个人提炼模型的上下文长度（tokens，默认 %(default)s）；超长总结按首尾保留截断，0 表示不检查",
+    )
+    parser.add_argument(
+        "--parse-workers",
+        default=defaults.parse_workers,
+        type=int,
+        help="解析 txt/md/docx 的进程数（默认 %(default)s；0 表示在线程中解析；大批量 docx 时可设为 CPU 核数）",
+    )
     args = parser.parse_args(argv)
+    run(AnalyzeConfig(**vars(args)), progress)
+
+
+def run(cfg: AnalyzeConfig, progress: Optional[Callable[[str], None]] = None) -> None:
+    """Run one analysis; like the CLI, fatal input/aggregate errors raise SystemExit."""
+    load_prompt_builder.cache_clear()
+    with queued_logging(progress):
+        asyncio.run(amain(cfg))
+
+
+async def amain(cfg: AnalyzeConfig) -> None:
 
-    load_env_from_file(args.env_file)
+    load_env_from_file(cfg.env_file)
 
-    if not args.input.exists():
-        raise SystemExit(f"输入目录不存在: {args.input}")
+    if not cfg.input_dir.exists():
+        raise SystemExit(f"输入目录不存在: {cfg.input_dir}")
 
-    extra_prompt = args.plan_prompt
+    extra_prompt = cfg.plan_prompt
 
-    client = create_client()
-    reports = collect_reports(args.input)
+    reports = collect_reports(cfg.input_dir)
     if not reports:
         raise SystemExit("未找到可处理的文件，请确认目录下包含 txt/md/docx 文件。")
 
-    print(f"[信息] 发现 {len(reports)} 篇总结，开始逐篇提炼...")
-    per_report_dir = args.out_dir / "per_report"
-    per_report_dir.mkdir(parents=True, exist_ok=True)
-    people: List[Dict[str, Any]] = []
-    for idx, report in enumerate(reports, start=1):
-        print(f"[{idx}/{len(reports)}] 处理 {report.path} ...")
+    # the context manager closes the client's HTTP connection pool when the run ends or fails
+    async with create_client() as client:
+        logger.info("[信息] 发现 %d 篇总结，开始并发提炼（并发数 %d）...", len(reports), cfg.concurrency)
+        per_report_dir = cfg.out_dir / "per_report"
+        per_report_dir.mkdir(parents=True, exist_ok=True)
+        sem = asyncio.Semaphore(max(1, cfg.concurrency))
+        limiter = RateLimiter(cfg.max_requests_per_minute, cfg.max_tokens_per_minute)
+        usage = UsageTotals()
+        # dedup_key -> shared extraction, so byte-identical (e.g. templated) reports cost one call
+        inflight: Dict[str, "asyncio.Future[Any]"] = {}
+        journal_path = cfg.out_dir / "individual_summaries.jsonl"
+        parse_workers = min(cfg.parse_workers, len(reports))
+        # spawn, not fork: the web UI calls in from a process that is already running other threads
+        parse_pool = (
+            ProcessPoolExecutor(max_workers=parse_workers, mp_context=multiprocessing.get_context("spawn"))
+            if parse_workers > 1
+            else None
+        )
+        # create the tasks up front: as_completed schedules bare coroutines in set order, not input order
+        tasks = [
+            asyncio.ensure_future(
+                process_report(
+                    sem, client, limiter, cfg, report, idx, len(reports), per_report_dir, parse_pool, usage, inflight
+                )
+            )
+            for idx, report in enumerate(reports, start=1)
+        ]
+        finished: Dict[int, Dict[str, Any]] = {}
+        try:
+            with journal_path.open("w", encoding="utf-8", buffering=1) as journal:
+                # handle each summary as soon as it lands instead of waiting for the slowest request
+                for next_done in asyncio.as_completed(tasks):
+                    idx, summary = await next_done
+                    # one line per finished report, so partial results survive a crash mid-batch
+                    journal.write(json_dumps(summary) + "\n")
+                    finished[idx] = summary
+                    logger.info("[进度] 已完成 %d/%d", len(finished), len(reports))
+        finally:
+            if parse_pool is not None:
+                parse_pool.shutdown(cancel_futures=True)
+        people = [finished[idx] for idx in sorted(finished)]
+
+        people_path = cfg.out_dir / "individual_summaries.json"
+        write_json(people_path, people)
+        logger.info("[完成] 已写入个人提炼结果: %s", people_path)
+
+        logger.info("[信息] 开始生成部门与整体评价 ...")
         try:
-            summary = summarize_individual(
-                client, args.model, report, args.temperature, args.max_tokens_individual
+            aggregate_markdown = await aggregate_review(
+                client,
+                cfg.aggregate_model,
+                people,
+                cfg.temperature,
+                extra_prompt,
+                cfg.max_tokens_aggregate,
+                limiter=limiter,
+                max_attempts=cfg.max_attempts,
+                usage=usage,
             )
-            people.append(summary)
-            rel_json = report.path.relative_to(args.input).with_suffix(".json")
-            dest = per_report_dir / rel_json
-            dest.parent.mkdir(parents=True, exist_ok=True)
-            dest.write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8")
+            agg_error = None
         except Exception as exc:
-            print(f"[错误] 提炼失败: {report.path} -> {exc}")
-            fail = make_failure_record(report, str(exc))
-            people.append(fail)
-            rel_json = report.path.relative_to(args.input).with_suffix(".json")
-            dest = per_report_dir / rel_json
-            dest.parent.mkdir(parents=True, exist_ok=True)
-            dest.write_text(json.dumps(fail, ensure_ascii=False, indent=2), encoding="utf-8")
-
-    args.out_dir.mkdir(parents=True, exist_ok=True)
-    people_path = args.out_dir / "individual_summaries.json"
-    people_path.write_text(json.dumps(people, ensure_ascii=False, indent=2), encoding="utf-8")
-    print(f"[完成] 已写入个人提炼结果: {people_path}")
-
-    print("[信息] 开始生成部门与整体评价 ...")
-    try:
-        aggregate_markdown = aggregate_review(
-            client,
-            args.aggregate_model,
-            people,
-            args.temperature,
-            extra_prompt,
-            args.max_tokens_aggregate,
+            agg_error = str(exc)
+            aggregate_markdown = f"生成失败：{agg_error}"
+            logger.error("[错误] 汇总失败: %s", agg_error)
+
+        report_path = cfg.out_dir / "organization_review.md"
+        header = (
+            f"# 年终总结评审\n\n"
+            f"生成时间：{datetime.now().isoformat(timespec='seconds')}\n"
+            f"使用模型：个人提炼={cfg.model}；汇总={cfg.aggregate_model}\n"
+            f"采样温度：{cfg.temperature}\n\n"
         )
-        agg_error = None
-    except Exception as exc:
-        agg_error = str(exc)
-        aggregate_markdown = f"生成失败：{agg_error}"
-        print(f"[错误] 汇总失败: {agg_error}")
-
-    report_path = args.out_dir / "organization_review.md"
-    header = (
-        f"# 年终总结评审\n\n"
-        f"生成时间：{datetime.now().isoformat(timespec='seconds')}\n"
-        f"使用模型：个人提炼={args.model}；汇总={args.aggregate_model}\n"
-        f"采样温度：{args.temperature}\n\n"
-    )
-    report_path.write_text(header + aggregate_markdown + "\n", encoding="utf-8")
-    if agg_error:
-        raise SystemExit("汇总失败，详见上方日志")
-    print(f"[完成] 已写入综合报告: {report_path}")
+        report_path.write_text(header + aggregate_markdown + "\n", encoding="utf-8")
+        if usage.prompt_tokens:
+            logger.info(
+                "[信息] token 用量：输入 %d（前缀缓存命中 %d，%.0f%%），输出 %d",
+                usage.prompt_tokens,
+                usage.cache_hit_tokens,
+                100 * usage.cache_hit_tokens / usage.prompt_tokens,
+                usage.completion_tokens,
+            )
+        if agg_error:
+            raise SystemExit("汇总失败，详见上方日志")
+        logger.info("[完成] 已写入综合报告: %s", report_path)
 
 
 if __name__ == "__main__":
@@ -10,8 +10,8 @@
 from typing import Dict, Any
 
 
-def build_system_prompt(ctx: Dict[str, Any]) -> str:
-    return (
+# Static text, built once at import; build_system_prompt returns the same object on every call.
+_SYSTEM_PROMPT = (
        "You are a “strategic and organizational development consultant” serving a digital manufacturing department. You now need to generate a “Annual Analysis and Mid-Term Strategic Recommendations” report for department leaders and business unit executives, based on multiple individual annual analysis reports."
 
 "[Input Instructions]"
@@ -111,7 +111,11 @@ def build_system_prompt(ctx: Dict[str, Any]) -> str:
 " - Do not comment on individuals by name; abstract content to the level of “roles / teams / capabilities.”"
 " - You may moderately reference representative scenarios or project examples, but avoid disclosing excessive personal detail."
 " - Maintain clear logical structure and layering, and prefer paragraph-style narrative over short phrases."
-    )
+)
+
+
+def build_system_prompt(ctx: Dict[str, Any]) -> str:
+    return _SYSTEM_PROMPT
 
 
 def build_prompt(ctx: Dict[str, Any]) -> str:
@@ -7,129 +7,141 @@
 - department_focus: str
 - report: 具有 path/department/title/role/content 属性的对象
 - raw_content: str
+- job_type: str | None（_JOB_WEIGHTS 的键，由 analyze_reports.classify_department 按部门给出；干部岗忽略）
+system prompt 对所有报告逐字节相同（便于服务端前缀缓存），按人变化的内容（含岗位评价侧重）只放在用户 prompt。
 """
 
-from typing import Any, Dict
-
+from typing import Any, Dict, Final, Tuple
+
+# job type -> (label, evaluation focus); rendered once into the per-job focus blocks below
+_JOB_WEIGHTS: Final[Dict[str, Tuple[str, str]]] = {
+    "logistics": (
+        "Logistics",
+        "project and scenario value (contribution to projects such as Rizhao Steel, Yongfeng, etc.), ability to "
+        "decompose business scenarios, cross-department collaboration (planning/production/marketing), customer "
+        "value and business indicator improvements (loading rate, back-and-forth movement rate, stability, etc.).",
+    ),
+    "planning": (
+        "Planning",
+        "planning system design (mid-/long-term or short-cycle), data definitions and constraint sorting, "
+        "integration with production/logistics systems, rolling planning and emergency adjustment mechanisms.",
+    ),
+    "cost": (
+        "Cost & Performance",
+        "indicator system and cost model design, cost-benefit analysis, closed-loop mechanisms (from data "
+        "acquisition to improvement), and the ability to support business decision-making.",
+    ),
+    "quality": (
+        "Quality Inspection / Testing",
+        "testing strategy and coverage, defect discovery and closure, quality standard accumulation, and "
+        "contribution to project delivery stability.",
+    ),
+    "algorithm": (
+        "Algorithm Modeling / Data Science",
+        "model and algorithm innovation, business impact (optimization results, indicator improvement), data "
+        "governance awareness, engineering norms (performance, maintainability), and research outputs (papers, "
+        "patents, methodology).",
+    ),
+    "rd": (
+        "R&D Implementation / Engineering Development",
+        "engineering quality (stability, performance, maintainability), reusable capability accumulation "
+        "(components, tools), cross-team coordination with product/algorithm/implementation teams, and ability "
+        "to deliver complex requirements.",
+    ),
+    "product": (
+        "Product Design",
+        "requirement abstraction and scenario modeling, common capability extraction (templates, "
+        "configurability), cross-project reusability, and collaborative design with algorithm/R&D teams.",
+    ),
+    "operations": (
+        "Product Operations / O&M",
+        "launch promotion and user training, issue response and closure, release and change management, user "
+        "satisfaction and engagement.",
+    ),
+}
+
+_COMMON_HEADER: Final[str] = """\
+You are a "management consulting advisor + organizational development expert" familiar with digital transformation and project delivery in the steel industry, and you understand the functional divisions within the Control Department, including but not limited to:
+- General Management
+- Solutions Office: Logistics Group / Planning Group / Cost & Performance Group / Quality Inspection Group / Algorithm & Model Section
+- R&D Section: Frontend development, backend development
+- Product Office: Product Architecture, Common Product Design, Business Product Design, Management Assistance
+- Product Operations Section: Product Launch, O&M, Training, Promotion, etc.
+
+Your task is: Based on an employee's annual personal summary, and without fabricating any facts, conduct "structured extraction + capability profiling + development recommendations" aligned with their department and job role, to support subsequent department-level analysis and strategic planning.
+
+Please process the content according to the following steps:
+
+1. Identify job type and evaluation focus
+The "Evaluation focus" section of the user message gives the job type suggested by the department folder and file title together with its evaluation focus, or the full list of job types to choose from. Apply that focus in the later sections.
+"""
 
-def build_system_prompt(ctx: Dict[str, Any]) -> str:
+# used when the job type cannot be inferred up front: the model classifies and picks the focus itself
+_DEFAULT_WEIGHTS: Final[str] = """\
+Based on the document folder fields and keywords in the text, classify this person into one job type (for internal analysis only, no need to output a separate section): General Management; Process (Logistics, Planning, Cost, Quality); Algorithm Modeling / Data Science; R&D Implementation / Engineering Development; Product Design (including common products and business products); Product Operations / Implementation & O&M.
+Apply the evaluation focus of that job type in the later sections:
+""" + "\n".join(f"- {label}: {focus}" for label, focus in _JOB_WEIGHTS.values())
+
+_COMMON_FOOTER: Final[str] = """
+For managers, additionally pay attention to the key focus areas of their entire department.
+
+2. Produce the individual "analysis report" using a unified structure
+Do not simply restate the original text; reorganize and abstract it, in professional but concise language:
+[1. Role and Work Scope Reconstruction] (about 2-4 sentences) The "role" and "key responsibility scope" this person carried this year; which projects/scenarios they mainly supported (e.g., Rizhao automatic loading, Yongfeng APS, cost performance system, product common capabilities) and where they sit in the business workflow.
+[2. Key Achievements of the Year] 3-6 items in order of importance, each as "[Project/Scenario] + [What action was taken] + [What result/value was created (quantified if possible)]"; categorize and refine scattered achievements.
+[3. Capability Profile] 5-8 dimensions relevant to the job type (Business Insight / Scenario Understanding; Solution Design / Model Design; Project Execution & Delivery; Data & Algorithm Capability; Engineering Implementation / Technical Depth; Product Thinking & Abstraction; Communication & Cross-department Collaboration; Management & Mentoring if applicable), each with a one-sentence status and a level (Strong / Medium / Needs Improvement).
+[4. Methodologies and Reusable Assets] 3-8 methodologies, frameworks, standards or tools that can become departmental assets, each with its type, suitable scenario, and maturity (in pilot / reused across multiple projects / exploratory).
+[5. Issues, Weaknesses, and Risk Points] 3-5 items, each with phenomenon, impact (on project/team/customer), and initial root-cause judgment.
+[6. Development Priorities & Recommendations for Next Year] 3-6 actionable items covering personal growth and contribution to the department, each with direction, objective, and implementation path.
+[7. Tags] A tags list for machine aggregation covering department/group, key project names, key technical domains, and major business scenarios, e.g. ["Solutions Office - Logistics Group", "Management", "Algorithm Modeling", "Project Execution", "2024"].
+
+3. Style Requirements
+Use professional, restrained, consulting-style wording; avoid empty adjectives.
+Do not copy sentences from the original text; abstract and reorganize, but output the full structure.
+Do not fabricate facts: if certain information is missing, state "Difficult to judge XXX based on the available information."
+Do not provide moral evaluations; focus on capabilities and work performance."""
+
+
+def _job_block(label: str, focus: str) -> str:
     return (
-"You are a “management consulting advisor + organizational development expert” familiar with digital transformation and project delivery in the steel industry, and you understand the functional divisions within the Control Department, including but not limited to:"
-
-"- General Management"
-"- Solutions Office: Logistics Group / Planning Group / Cost & Performance Group / Quality Inspection Group / Algorithm & Model Section"
-"- R&D Section: Frontend development, backend development"
-"- Product Office: Product Architecture, Common Product Design, Business Product Design, Management Assistance"
-"- Product Operations Section: Product Launch, O&M, Training, Promotion, etc."
-
-"Your task is: Based on an employee’s annual personal summary, and without fabricating any facts, conduct “structured extraction + capability profiling + development recommendations” aligned with their department and job role, to support subsequent department-level analysis and strategic planning."
-
-"[Input Format]"
-"I will provide each employee’s annual summary Word document to you:"
-
-"Please process the content according to the following steps:"
-
-"1. Identify job type and evaluation focus"
-"1. Based on the document folder fields and keywords in the text, classify this person into one job type (for internal analysis only, no need to output a separate section):"
-" - General Management"
-" - Process (Logistics, Planning, Cost, Quality)"
-" - Algorithm Modeling / Data Science"
-" - R&D Implementation / Engineering Development"
-" - Product Design (including common products and business products)"
-" - Product Operations / Implementation & O&M"
-
-"2. Apply different evaluation weights depending on the job type (reflected in later sections), for example:"
-" - If the type is “Logistics”:"
-"- Focus on: project and scenario value (contribution to projects such as Rizhao Steel, Yongfeng, etc.), ability to decompose business scenarios, cross-department collaboration (planning/production/marketing), customer value and business indicator improvements (loading rate, back-and-forth movement rate, stability, etc.)."
-" - If the type is “Planning”:"
-"- Focus on: planning system design (mid-/long-term or short-cycle), data definitions and constraint sorting, integration with production/logistics systems, rolling planning and emergency adjustment mechanisms."
-" - If the type is “Cost & Performance”:"
-"- Focus on: indicator system and cost model design, cost-benefit analysis, closed-loop mechanisms (from data acquisition to improvement), and the ability to support business decision-making."
-" - If the type is “Quality Inspection / Testing”:"
-"- Focus on: testing strategy and coverage, defect discovery and closure, quality standard accumulation, and contribution to project delivery stability."
-" - If the type is “Algorithm Modeling / Data Science”:"
-"- Focus on: model and algorithm innovation, business impact (optimization results, indicator improvement), data governance awareness, engineering norms (performance, maintainability), and research outputs (papers, patents, methodology)."
-" - If the type is “R&D Implementation / Engineering Development”:"
-"- Focus on: engineering quality (stability, performance, maintainability), reusable capability accumulation (components, tools), cross-team coordination with product/algorithm/implementation teams, and ability to deliver complex requirements."
-" - If the type is “Product Design”:"
-"- Focus on: requirement abstraction and scenario modeling, common capability extraction (templates, configurability), cross-project reusability, and collaborative design with algorithm/R&D teams."
-" - If the type is “Product Operations / O&M”:"
-"- Focus on: launch promotion and user training, issue response and closure, release and change management, user satisfaction and engagement."
-
-"For managers to pay extra attention to the key focus areas of their entire department"
-
-"2. Produce the individual “analysis report” using a unified structure"
-"Do not simply restate the original text; reorganize and abstract it, and output the following structure in professional but concise language:"
-
-"[1. Role and Work Scope Reconstruction] (about 2–4 sentences)"
-"Summarize in your own words the “role” and “key responsibility scope” this person has carried this year."
-"Explain, if possible: which projects/scenarios they mainly supported (e.g., Rizhao automatic loading, Yongfeng APS, cost performance system, product common capabilities), and where they sit in the business workflow."
-
-"[2. Key Achievements of the Year (in order of importance)]"
-"List 3–6 key achievements. Each item should follow the structure:"
-" - “[Project/Scenario] + [What action was taken] + [What result/value was created (quantified or concretized if possible)]”"
-"If the original achievements are scattered, please categorize and refine them appropriately."
-
-"[3. Capability Profile (tagged by dimension)]"
-"Select 5–8 relevant dimensions below based on the job type for evaluation:"
-" - Business Insight / Scenario Understanding"
-" - Solution Design / Model Design"
-" - Project Execution & Delivery"
-" - Data & Algorithm Capability"
-" - Engineering Implementation / Technical Depth"
-" - Product Thinking & Abstraction Ability"
-" - Communication & Cross-department Collaboration"
-" - Management & Mentoring (if applicable)"
-"For each dimension, describe the status in one sentence and assign a level (Strong / Medium / Needs Improvement). Example:"
-" - “Business Insight: Able to abstract solution requirements from on-site problems and understand key production/logistics indicators (Upper-middle).”"
-
-"[4. Methodologies and Reusable Assets]"
-"Extract the “methodologies,” “frameworks,” “standards,” and “tools” demonstrated by this person that can be accumulated as departmental assets."
-"List 3–8 items, each including:"
-" - What type of method/tool it is (name or brief description)"
-" - What scenario it is suitable for"
-" - Current maturity level (in pilot / reused across multiple projects / exploratory)"
-
-"[5. Issues, Weaknesses, and Risk Points]"
-"Based on the difficulties, unfinished items, and your analysis, summarize 3–5 key individual issues or weaknesses."
-"Each item should include:"
-" - Phenomenon (what is observed)"
-" - Impact (effect on project/team/customer)"
-" - Initial root-cause judgment (e.g., insufficient experience, time allocation issues, unclear role positioning, coordination mechanism issues)"
-
-"[6. Development Priorities & Recommendations for Next Year]"
-"Provide 3–6 actionable recommendations from both “personal growth” and “contribution to department/organization” perspectives."
-"Each recommendation should include:"
-" - Suggested direction (e.g., undertake one or two benchmark projects integrating algorithms and business)"
-" - Objective (what problem to solve or what capability level to reach)"
-" - Implementation path (e.g., follow a key project + assigned mentor + join specific research topics)"
-
-"[7. Tags (for subsequent aggregation)]"
-"Output a tags list for machine-based aggregation, example:"
-" - tags: ["Solutions Office - Logistics Group", "Management", "Algorithm Modeling", "Project Execution", "2024"]"
-"Try to cover: department/group, key project names, key technical domains, and major business scenarios."
-
-"3. Style Requirements"
-"Use professional, restrained, consulting-style wording; avoid empty adjectives."
-"Do not copy sentences from the original text; abstract and reorganize, but output the full structure."
-"Do not fabricate facts: if certain information is missing, state it as “Difficult to judge XXX based on the available information."
-"Do not provide moral evaluations; focus on “capabilities and work performance."
-
+        f"The department folder and title indicate the job type {label}; confirm it against the text. "
+        f"Apply this evaluation focus in the later sections (if the text clearly shows another job type, "
+        f"use the focus appropriate to that type instead):\n- {label}: {focus}"
     )
 
 
+# one byte-identical system prompt for every report, so the provider can reuse its cached prefix;
+# the per-job weighting block travels in the user message instead
+_SYSTEM_PROMPT: Final[str] = _COMMON_HEADER + _COMMON_FOOTER
+_FOCUS_BLOCKS: Final[Dict[str, str]] = {job: _job_block(label, focus) for job, (label, focus) in _JOB_WEIGHTS.items()}
+
+
+_ROLE_LABELS: Final[Dict[str, str]] = {"cadre": "干部/管理岗"}
+
+
+def build_system_prompt(ctx: Dict[str, Any]) -> str:
+    return _SYSTEM_PROMPT
+
+
 def build_prompt(ctx: Dict[str, Any]) -> str:
     r = ctx["report"]
+    # managers are weighed on the whole department, not one function's metrics
+    job_type = None if r.role == "cadre" else ctx.get("job_type")
+    job_label = _JOB_WEIGHTS[job_type][0] if job_type in _JOB_WEIGHTS else "未判定（由模型判断）"
     return f"""
 Context:
 - Industry focus: {ctx['industry_context']}
 - Department focus: {ctx['department_focus']}
 - 输入格式包含：姓名、所在部门、岗位、职称、入司时间、本年度完成的主要工作及成果、自我评价、问题与不足、体会和建议等。
 
+Evaluation focus:
+{_FOCUS_BLOCKS.get(job_type, _DEFAULT_WEIGHTS)}
+
 Metadata:
 - Department (from folder): {r.department}
 - File title: {r.title}
-- Role guess from title: {"干部/管理岗" if r.role == "cadre" else "普通员工"}
+- Role guess from title: {_ROLE_LABELS.get(r.role, "普通员工")}
+- Job type guess: {job_label}
 - Source path: {r.path}
 
 Raw content:
@@ -0,0 +1,78 @@
+"""Sharing one extraction between byte-identical reports (summarize_individual with `inflight`)."""
+
+import asyncio
+import json
+import re
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import analyze_reports  # noqa: E402
+
+
+class EchoClient:
+    """Stands in for AsyncOpenAI: answers with the metadata the prompt carried, like a model copying it."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        user = kwargs["messages"][1]["content"]
+        department = re.search(r"Department \(from folder\): (.*)", user).group(1)
+        title = re.search(r"File title: (.*)", user).group(1)
+        content = json.dumps({"name": title, "department": department, "title": title, "tags": [department]})
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+class DedupTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = Path(self.tmp.name)
+
+    def make_report(self, department: str, title: str) -> analyze_reports.Report:
+        path = self.root / department / f"{title}.txt"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("本年度完成了排程系统上线，负责接口联调。", encoding="utf-8")
+        return analyze_reports.Report(path, department, title, "employee")
+
+    def summarize(self, reports):
+        client = EchoClient()
+
+        async def run():
+            inflight = {}
+            return await asyncio.gather(
+                *(
+                    analyze_reports.summarize_individual(client, "m", report, 1.0, 800, inflight=inflight)
+                    for report in reports
+                )
+            )
+
+        return client, asyncio.run(run())
+
+    def test_identical_text_in_two_departments_is_not_shared(self) -> None:
+        reports = [self.make_report("研发室", "员工1"), self.make_report("产品运营室", "李四")]
+        client, summaries = self.summarize(reports)
+        self.assertEqual(client.calls, 2)
+        self.assertEqual([s["department"] for s in summaries], ["研发室", "产品运营室"])
+        self.assertEqual([s["title"] for s in summaries], ["员工1", "李四"])
+
+    def test_identical_text_in_one_department_shares_a_call_but_keeps_identity(self) -> None:
+        reports = [self.make_report("研发室", "员工1"), self.make_report("研发室", "员工2")]
+        client, summaries = self.summarize(reports)
+        self.assertEqual(client.calls, 1)
+        self.assertEqual([s["name"] for s in summaries], ["员工1", "员工2"])
+        self.assertEqual([s["title"] for s in summaries], ["员工1", "员工2"])
+        self.assertEqual([s["source_path"] for s in summaries], [str(r.path) for r in reports])
+
+
+if __name__ == "__main__":
+    unittest.main()
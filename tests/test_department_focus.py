@@ -0,0 +1,55 @@
+"""One department classifier feeds both the department hint and the per-job evaluation focus."""
+
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import analyze_reports  # noqa: E402
+from prompts.individual import prompt  # noqa: E402
+
+
+def render(department: str, role: str = "employee") -> str:
+    report = analyze_reports.Report(Path(f"{department}/x.docx"), department, "x", role)
+    job_type, hint = analyze_reports.classify_department(department)
+    return prompt.build_prompt(
+        {
+            "industry_context": analyze_reports.INDUSTRY_CONTEXT,
+            "department_focus": hint,
+            "job_type": job_type,
+            "report": report,
+            "raw_content": "",
+        }
+    )
+
+
+class DepartmentClassifierTest(unittest.TestCase):
+    def test_product_operations_is_not_product(self) -> None:
+        job_type, hint = analyze_reports.classify_department("产品运营室")
+        self.assertEqual(job_type, "operations")
+        self.assertTrue(hint.startswith("产品运营/ERP"))
+        text = render("产品运营室")
+        self.assertIn("- Department focus: 产品运营/ERP", text)
+        self.assertIn(prompt._FOCUS_BLOCKS["operations"], text)
+        self.assertNotIn(prompt._FOCUS_BLOCKS["product"], text)
+
+    def test_product(self) -> None:
+        job_type, hint = analyze_reports.classify_department("产品室")
+        self.assertEqual(job_type, "product")
+        self.assertTrue(hint.startswith("产品："))
+        self.assertIn(prompt._FOCUS_BLOCKS["product"], render("产品室"))
+
+    def test_cadre_gets_default_weights(self) -> None:
+        text = render("产品运营室", role="cadre")
+        self.assertIn(prompt._DEFAULT_WEIGHTS, text)
+        self.assertNotIn(prompt._FOCUS_BLOCKS["operations"], text)
+
+    def test_unknown_department(self) -> None:
+        self.assertEqual(
+            analyze_reports.classify_department("其他"), (None, analyze_reports.DEFAULT_DEPARTMENT_HINT)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,35 +4,94 @@ Simple web UI backend for analyze_reports.py
 Features:
 - Upload documents by department path (hierarchical storage under web_uploads/)
 - Configure API key, models, temperature
-- Run analysis and return output paths/logs
+- Run analysis and return output paths/logs (streamed, or as a background job polled via /status)
 - Download output files
 """
 
 from __future__ import annotations
 
-import io
 import os
-import sys
+import gc
+import hashlib
 import json
+import multiprocessing
+import shutil
+import time
+import uuid
+import functools
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, Callable, Optional
-from queue import Queue
-from threading import Thread
+from typing import Any, Dict, Callable, Iterator, Optional, Tuple
+from queue import Empty, SimpleQueue
+from threading import Lock, Thread
 
-from flask import Flask, jsonify, request, send_from_directory, abort, stream_with_context
+from flask import Flask, jsonify, request, send_file, send_from_directory, abort, stream_with_context
 from werkzeug.utils import secure_filename
 
 import analyze_reports
 
+try:  # optional: faster JSON encoding for /tree and SSE frames
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore[assignment]
+
 APP = Flask(__name__)
 
 BASE_DIR = Path(__file__).parent.resolve()
 UPLOAD_ROOT = BASE_DIR / "up_load"
 RUN_ROOT = BASE_DIR / "web_runs"
+# shared across runs (each run gets a fresh out_dir), so unchanged reports skip the API on re-runs
+CACHE_ROOT = BASE_DIR / "llm_cache"
+# deleted folders are renamed in here and removed in the background
+TRASH_ROOT = BASE_DIR / ".trash"
 UPLOAD_ROOT.mkdir(exist_ok=True)
 RUN_ROOT.mkdir(exist_ok=True)
 
+# reject oversized upload requests up front (413) instead of spooling them to disk first
+APP.config["MAX_CONTENT_LENGTH"] = int(os.getenv("WEB_MAX_UPLOAD_MB", "256")) * 1024 * 1024
+UPLOAD_COPY_CHUNK = 1 << 20
+# behind nginx/apache with X-Sendfile support, let the proxy stream /download files itself
+APP.config["USE_X_SENDFILE"] = os.getenv("WEB_USE_X_SENDFILE", "").lower() in ("1", "true", "yes")
+
+# log lines arriving within this window (or until this many chars) are merged into one SSE frame
+SSE_COALESCE_SECONDS = 0.05
+SSE_COALESCE_CHARS = 16 * 1024
+_NO_ITEM = object()
+
+# (root mtime, tree, etag) keyed by root; entries carry the root mtime and are dropped wholesale by
+# invalidate_tree_cache() whenever /upload, /delete or /mkdir change something below the root
+_TREE_LOCK = Lock()
+_TREE_CACHE: Dict[Path, Any] = {}
+_TREE_GENERATION = 0
+
+# /run jobs: one analysis at a time in a separate process, logs relayed through a manager queue
+JOBS: Dict[str, Dict[str, Any]] = {}
+_JOBS_LOCK = Lock()
+_JOB_EXECUTOR: Optional[ProcessPoolExecutor] = None
+_JOB_MANAGER: Any = None
+# finished jobs (logs + result) are kept this long for /status, and at most this many of them
+JOB_TTL_SECONDS = int(os.getenv("WEB_JOB_TTL_SECONDS", "3600"))
+JOBS_MAX_FINISHED = 32
+
+_DELETE_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="fs-del")
+
+# runs in flight with the cyclic GC paused; collection resumes when the last one finishes
+_GC_PAUSE_LOCK = Lock()
+_GC_PAUSE_DEPTH = 0
+
+
+def json_bytes(data: Any) -> bytes:
+    """Compact UTF-8 JSON with non-ASCII kept as-is (orjson when available)."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data)
+        except TypeError:
+            pass  # e.g. non-str dict keys; let the stdlib handle it
+    return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
 
 def safe_join(root: Path, relative_path: str | Path) -> Path:
     """Join and ensure the path stays within root (prevent path traversal)."""
@@ -57,35 +116,109 @@ def upload_files():
             continue
         dest = target / fname
         dest.parent.mkdir(parents=True, exist_ok=True)
-        file.save(dest)
+        # one pass from werkzeug's spooled part into the destination, in 1 MiB chunks
+        with open(dest, "wb", buffering=0) as out:
+            shutil.copyfileobj(file.stream, out, length=UPLOAD_COPY_CHUNK)
         saved.append(str(dest.relative_to(BASE_DIR)))
+    invalidate_tree_cache()
     return jsonify({"saved": saved, "upload_root": str(UPLOAD_ROOT.relative_to(BASE_DIR))})
 
 
-def build_tree(root: Path) -> Dict[str, Any]:
-    node = {"name": root.name, "path": root.relative_to(BASE_DIR).as_posix(), "type": "dir", "children": []}
+def invalidate_tree_cache() -> None:
+    global _TREE_GENERATION
+    with _TREE_LOCK:
+        _TREE_GENERATION += 1
+        _TREE_CACHE.clear()
+
+
+def scan_tree(root: Path) -> Dict[str, Any]:
+    """Walk root with an explicit stack over os.scandir, reusing each DirEntry's cached type/stat."""
+    root_rel = root.relative_to(BASE_DIR).as_posix()
+    node: Dict[str, Any] = {"name": root.name, "path": root_rel, "type": "dir", "children": []}
+    stack = [(node, str(root), root_rel)]
+    while stack:
+        parent, dir_path, dir_rel = stack.pop()
+        try:
+            with os.scandir(dir_path) as it:
+                entries = sorted(it, key=lambda e: (not e.is_dir(follow_symlinks=False), e.name.lower()))
+        except FileNotFoundError:
+            continue
+        children = parent["children"]
+        for entry in entries:
+            rel = f"{dir_rel}/{entry.name}"
+            if entry.is_dir(follow_symlinks=False):
+                child: Dict[str, Any] = {"name": entry.name, "path": rel, "type": "dir", "children": []}
+                stack.append((child, entry.path, rel))
+            else:
+                child = {"name": entry.name, "path": rel, "type": "file", "size": entry.stat(follow_symlinks=False).st_size}
+            children.append(child)
+    return node
+
+
+def count_entries(node: Dict[str, Any]) -> int:
+    total, stack = 0, [node]
+    while stack:
+        children = stack.pop().get("children", ())
+        total += len(children)
+        stack.extend(children)
+    return total
+
+
+def tree_snapshot(root: Path) -> Tuple[Dict[str, Any], str]:
+    """Return the (possibly cached) tree for root and its ETag; only the root is stat'ed on a cache hit.
+
+    The tree is shared with other callers and must not be mutated.
+    """
     try:
-        entries = sorted(root.iterdir(), key=lambda p: (p.is_file(), p.name.lower()))
+        mtime_ns = root.stat().st_mtime_ns
     except FileNotFoundError:
-        return node
-    for entry in entries:
-        if entry.is_dir():
-            node["children"].append(build_tree(entry))
-        else:
-            node["children"].append(
-                {
-                    "name": entry.name,
-                    "path": entry.relative_to(BASE_DIR).as_posix(),
-                    "type": "file",
-                    "size": entry.stat().st_size,
-                }
-            )
-    return node
+        mtime_ns = None
+    with _TREE_LOCK:
+        cached = _TREE_CACHE.get(root)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1], cached[2]
+        generation = _TREE_GENERATION
+    tree = scan_tree(root)
+    # the generation covers changes below the root that leave its own mtime untouched
+    etag = hashlib.blake2b(f"{mtime_ns}:{generation}:{count_entries(tree)}".encode(), digest_size=8).hexdigest()
+    with _TREE_LOCK:
+        # skip storing if an invalidation happened while scanning
+        if generation == _TREE_GENERATION:
+            _TREE_CACHE[root] = (mtime_ns, tree, etag)
+    return tree, etag
 
 
 @APP.route("/tree", methods=["GET"])
 def tree():
-    return jsonify(build_tree(UPLOAD_ROOT))
+    data, etag = tree_snapshot(UPLOAD_ROOT)
+    if etag in request.if_none_match:
+        return "", 304, {"ETag": f'"{etag}"'}
+    resp = APP.response_class(json_bytes(data), mimetype="application/json")
+    resp.set_etag(etag)
+    # let the browser keep the body but revalidate on every poll
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+
+def remove_tree_in_background(target: Path) -> None:
+    """Rename target out of the upload tree (atomic, so /tree and new runs stop seeing it) and rmtree it later."""
+    TRASH_ROOT.mkdir(exist_ok=True)
+    doomed = TRASH_ROOT / f"{target.name}.deleting-{uuid.uuid4().hex}"
+    try:
+        os.rename(target, doomed)
+    except OSError:
+        # e.g. up_load is a separate mount: fall back to deleting in place
+        shutil.rmtree(target)
+        return
+    _DELETE_EXECUTOR.submit(shutil.rmtree, doomed, ignore_errors=True)
+
+
+def sweep_trash() -> None:
+    """Finish deletions a previous server left behind in TRASH_ROOT (killed before its rmtree ran)."""
+    if not TRASH_ROOT.is_dir():
+        return
+    for doomed in TRASH_ROOT.glob("*.deleting-*"):
+        _DELETE_EXECUTOR.submit(shutil.rmtree, doomed, ignore_errors=True)
 
 
 @APP.route("/delete", methods=["POST"])
@@ -102,13 +235,13 @@ def delete_path():
         return jsonify({"error": "not found"}), 404
     try:
         if target.is_dir():
-            import shutil
-
-            shutil.rmtree(target)
+            remove_tree_in_background(target)
         else:
             target.unlink()
     except Exception as exc:  # pragma: no cover
         return jsonify({"error": str(exc)}), 500
+    finally:
+        invalidate_tree_cache()
     return jsonify({"deleted": rel_path})
 
 
@@ -121,6 +254,7 @@ def make_dir():
     try:
         target = safe_join(UPLOAD_ROOT, rel_path)
         target.mkdir(parents=True, exist_ok=True)
+        invalidate_tree_cache()
     except ValueError:
         return jsonify({"error": "invalid path"}), 400
     except Exception as exc:  # pragma: no cover
@@ -128,6 +262,34 @@ def make_dir():
     return jsonify({"created": rel_path})
 
 
+@contextmanager
+def gc_paused() -> Iterator[None]:
+    """Disable the cyclic GC for the duration of a run, then collect once; nested/concurrent runs share the pause."""
+    global _GC_PAUSE_DEPTH
+    with _GC_PAUSE_LOCK:
+        _GC_PAUSE_DEPTH += 1
+        if _GC_PAUSE_DEPTH == 1:
+            gc.disable()
+    try:
+        yield
+    finally:
+        with _GC_PAUSE_LOCK:
+            _GC_PAUSE_DEPTH -= 1
+            last = _GC_PAUSE_DEPTH == 0
+            if last:
+                gc.enable()
+        if last:
+            gc.collect()
+
+
+def has_any_file(root: Path) -> bool:
+    """True once os.walk reaches a directory holding a file; stops at the first one."""
+    for _dirpath, _dirnames, filenames in os.walk(root):
+        if filenames:
+            return True
+    return False
+
+
 def run_analysis(payload: Dict[str, Any], progress_cb: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
     input_dir = payload.get("input_dir") or UPLOAD_ROOT
     input_dir = safe_join(BASE_DIR, str(input_dir)) if not isinstance(input_dir, Path) else input_dir
@@ -136,11 +298,15 @@ def run_analysis(payload: Dict[str, Any], progress_cb: Optional[Callable[[str],
     aggregate_model = payload.get("aggregate_model", os.getenv("DEEPSEEK_AGG_MODEL", "deepseek-reasoner"))
     api_key = payload.get("api_key")
     plan_prompt = payload.get("plan_prompt")
-    max_tokens_individual = int(payload.get("max_tokens_individual", 1100))
+    max_tokens_individual = int(payload.get("max_tokens_individual", 800))
     max_tokens_aggregate = int(payload.get("max_tokens_aggregate", 5000))
+    concurrency = int(payload.get("concurrency") or os.getenv("DEEPSEEK_CONCURRENCY", "16"))
+    # 0 (threads) like the CLI: a spawn pool costs seconds of start-up per run and only pays off on large docx batches
+    parse_workers = int(payload.get("parse_workers") or os.getenv("DEEPSEEK_PARSE_WORKERS", "0"))
+    bypass_cache = bool(payload.get("bypass_cache"))
 
     # quick check: ensure there are files to process
-    if not any(Path(input_dir).rglob("*")):
+    if not has_any_file(Path(input_dir)):
         return {
             "exit_code": 1,
             "stdout": "",
@@ -159,24 +325,21 @@ def run_analysis(payload: Dict[str, Any], progress_cb: Optional[Callable[[str],
     if api_key:
         os.environ["DEEPSEEK_API_KEY"] = api_key
 
-    argv = [
-        "--input",
-        str(input_dir),
-        "--out-dir",
-        str(out_dir),
-        "--model",
-        model,
-        "--aggregate-model",
-        aggregate_model,
-        "--temperature",
-        str(temperature),
-        "--max-tokens-individual",
-        str(max_tokens_individual),
-        "--max-tokens-aggregate",
-        str(max_tokens_aggregate),
-    ]
-    if plan_prompt:
-        argv.extend(["--plan-prompt", str(plan_prompt)])
+    cfg = analyze_reports.AnalyzeConfig(
+        input_dir=Path(input_dir),
+        out_dir=out_dir,
+        model=model,
+        aggregate_model=aggregate_model,
+        temperature=temperature,
+        max_tokens_individual=max_tokens_individual,
+        max_tokens_aggregate=max_tokens_aggregate,
+        plan_prompt=str(plan_prompt) if plan_prompt else None,
+        concurrency=concurrency,
+        parse_workers=parse_workers,
+        cache_dir=CACHE_ROOT,
+        # the checkbox forces fresh answers but still stores them, so later normal runs pick them up
+        refresh_cache=bypass_cache,
+    )
 
     log_chunks: list[str] = []
 
@@ -187,30 +350,13 @@ def run_analysis(payload: Dict[str, Any], progress_cb: Optional[Callable[[str],
         if progress_cb:
             progress_cb(text)
 
-    class Writer:
-        def write(self, s: str) -> int:  # type: ignore[override]
-            emit(s)
-            return len(s)
-
-        def flush(self) -> None:
-            return
-
     exit_code = 0
     try:
         if progress_cb:
             emit("[web] 开始执行分析任务...\n")
-        with io.StringIO() as fake_stdin:
-            with open(os.devnull, "r") as devnull:
-                sys_stdin = sys.stdin
-                sys.stdin = devnull  # avoid blocking
-                try:
-                    from contextlib import redirect_stdout, redirect_stderr
-
-                    writer = Writer()
-                    with redirect_stdout(writer), redirect_stderr(writer):
-                        analyze_reports.main(argv)
-                finally:
-                    sys.stdin = sys_stdin
+        # a run is short-lived churn of prompt/JSON strings; skip gen-2 pauses mid-stream and collect once after
+        with gc_paused():
+            analyze_reports.run(cfg, progress=emit)
     except SystemExit as exc:
         exit_code = int(exc.code) if isinstance(exc.code, int) else 1
         if exc.code not in (0, None):
@@ -241,24 +387,165 @@ def run_analysis(payload: Dict[str, Any], progress_cb: Optional[Callable[[str],
     }
 
 
+def run_analysis_job(payload: Dict[str, Any], log_q: Any) -> Dict[str, Any]:
+    """Entry point inside the job process; log chunks go back through the manager queue."""
+    return run_analysis(payload, progress_cb=log_q.put)
+
+
+def submit_job(payload: Dict[str, Any], log_q: Any) -> Future:
+    """Submit to the job process pool, (re)creating it if it is missing or a previous job crashed it."""
+    global _JOB_EXECUTOR
+    # spawn rather than fork: the server process already runs request and SSE threads
+    ctx = multiprocessing.get_context("spawn")
+    with _JOBS_LOCK:
+        for _ in range(2):
+            if _JOB_EXECUTOR is None:
+                _JOB_EXECUTOR = ProcessPoolExecutor(max_workers=1, mp_context=ctx)
+            try:
+                return _JOB_EXECUTOR.submit(run_analysis_job, payload, log_q)
+            except BrokenProcessPool:
+                _JOB_EXECUTOR = None
+        raise RuntimeError("无法启动分析进程")
+
+
+def job_log_queue() -> Any:
+    global _JOB_MANAGER
+    with _JOBS_LOCK:
+        if _JOB_MANAGER is None:
+            _JOB_MANAGER = multiprocessing.get_context("spawn").Manager()
+        return _JOB_MANAGER.Queue()
+
+
+def end_job_logs(job: Dict[str, Any], _fut: Future) -> None:
+    # the job's own puts complete before its result is sent back, so this sentinel always comes last
+    log_q = job.get("log_q")
+    if log_q is not None:
+        log_q.put(None)
+
+
+def drain_job_logs(job: Dict[str, Any]) -> None:
+    log_q = job["log_q"]
+    while True:
+        chunk = log_q.get()
+        if chunk is None:
+            with _JOBS_LOCK:
+                job["drained"] = True
+                job["finished_at"] = time.monotonic()
+                # dropping the last proxy reference frees the queue in the manager process
+                job.pop("log_q", None)
+            return
+        with _JOBS_LOCK:
+            job["logs"].append(chunk)
+
+
+def prune_jobs() -> None:
+    """Forget finished jobs past JOB_TTL_SECONDS, then all but the newest JOBS_MAX_FINISHED; caller holds _JOBS_LOCK."""
+    now = time.monotonic()
+    finished = sorted(
+        (job["finished_at"], job_id) for job_id, job in JOBS.items() if job.get("finished_at") is not None
+    )
+    for index, (finished_at, job_id) in enumerate(finished):
+        if now - finished_at > JOB_TTL_SECONDS or index < len(finished) - JOBS_MAX_FINISHED:
+            del JOBS[job_id]
+
+
 @APP.route("/run", methods=["POST"])
 def run_job():
     data = request.get_json(force=True)
     try:
-        result = run_analysis(data or {})
+        log_q = job_log_queue()
+        fut = submit_job(data or {}, log_q)
     except Exception as exc:  # pragma: no cover
         return jsonify({"error": str(exc)}), 500
-    return jsonify(result)
+    job_id = uuid.uuid4().hex
+    job: Dict[str, Any] = {
+        "fut": fut,
+        "log_q": log_q,
+        "logs": [],
+        "created": datetime.now().isoformat(timespec="seconds"),
+    }
+    with _JOBS_LOCK:
+        prune_jobs()
+        JOBS[job_id] = job
+    # bound to the job rather than the queue, so the queue can be released once drained
+    fut.add_done_callback(functools.partial(end_job_logs, job))
+    Thread(target=drain_job_logs, args=(job,), daemon=True).start()
+    return jsonify({"job_id": job_id}), 202
+
+
+@APP.route("/status/<job_id>", methods=["GET"])
+def job_status(job_id: str):
+    try:
+        since = max(0, int(request.args.get("since", 0)))
+    except ValueError:
+        return jsonify({"error": "since 参数无效"}), 400
+    with _JOBS_LOCK:
+        prune_jobs()
+        job = JOBS.get(job_id)
+        if job is None:
+            return jsonify({"error": "任务不存在或已过期"}), 404
+        logs = job["logs"][since:]
+        drained = job.get("drained", False)
+    fut: Future = job["fut"]
+    body: Dict[str, Any] = {
+        "job_id": job_id,
+        "created": job["created"],
+        "logs": "".join(logs),
+        "next": since + len(logs),
+    }
+    if not fut.done() or not drained:
+        # report completion only once the trailing log chunks have been relayed
+        body["state"] = "running" if fut.running() or fut.done() else "queued"
+    elif fut.exception() is not None:
+        body["state"] = "error"
+        body["error"] = str(fut.exception()) or type(fut.exception()).__name__
+    else:
+        body["state"] = "done"
+        body["result"] = fut.result()
+    return jsonify(body)
+
+
+def coalesce_events(q: SimpleQueue[Any]) -> Iterator[Dict[str, Any]]:
+    """Yield queued events until the None sentinel, merging bursts of log events into one."""
+    while True:
+        item = q.get()
+        if item is None:
+            return
+        if item.get("type") != "log":
+            yield item
+            continue
+        parts = [item["message"]]
+        size = len(item["message"])
+        deadline = time.monotonic() + SSE_COALESCE_SECONDS
+        held: Any = _NO_ITEM
+        while size < SSE_COALESCE_CHARS:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                nxt = q.get(timeout=remaining)
+            except Empty:
+                break
+            if nxt is None or nxt.get("type") != "log":
+                held = nxt
+                break
+            parts.append(nxt["message"])
+            size += len(nxt["message"])
+        yield {"type": "log", "message": "".join(parts)}
+        if held is None:
+            return
+        if held is not _NO_ITEM:
+            yield held
 
 
 @APP.route("/run-stream", methods=["POST"])
 def run_stream():
     data = request.get_json(force=True)
-    q: Queue[Any] = Queue()
+    # one producer, one consumer: SimpleQueue skips Queue's Condition/unfinished-task bookkeeping
+    q: SimpleQueue[Any] = SimpleQueue()
 
     def progress(chunk: str) -> None:
-        for line in chunk.splitlines(True):
-            q.put({"type": "log", "message": line})
+        q.put({"type": "log", "message": chunk})
 
     def worker() -> None:
         try:
@@ -272,11 +559,8 @@ def run_stream():
     Thread(target=worker, daemon=True).start()
 
     def stream():
-        while True:
-            item = q.get()
-            if item is None:
-                break
-            yield f"data: {json.dumps(item, ensure_ascii=False)}\n\n"
+        for item in coalesce_events(q):
+            yield b"data: " + json_bytes(item) + b"\n\n"
 
     resp = APP.response_class(stream_with_context(stream()), mimetype="text/event-stream")
     resp.headers["Cache-Control"] = "no-cache"
@@ -298,12 +582,17 @@ def download_file():
             resolved = safe_join(root, rel)
         except ValueError:
             continue
-        if resolved.exists():
+        if resolved.is_file():
             file_path = resolved
             break
     if file_path is None:
         abort(404)
-    return send_from_directory(directory=file_path.parent, path=file_path.name, as_attachment=True)
+    # conditional: ETag/Last-Modified revalidation and Range (206) support; the body goes out through
+    # the server's file wrapper (sendfile where available) or X-Sendfile instead of a Python copy loop
+    resp = send_file(file_path, as_attachment=True, conditional=True, etag=True, max_age=60)
+    resp.cache_control.public = False
+    resp.cache_control.private = True
+    return resp
 
 
 @APP.route("/", methods=["GET"])
@@ -317,4 +606,19 @@ def frontend_assets(filename: str):
 
 
 if __name__ == "__main__":
-    APP.run(host="0.0.0.0", port=5000, debug=False)
+    # only the server process sweeps; spawned /run workers import this module as __mp_main__
+    sweep_trash()
+    try:
+        from waitress import serve
+    except ImportError:  # pragma: no cover
+        APP.run(host="0.0.0.0", port=5000, debug=False, threaded=True)
+    else:
+        # a thread per request so /tree, /upload and long /run-stream responses don't queue behind each other;
+        # channel_timeout must outlast the quietest stretch of an SSE stream
+        serve(
+            APP,
+            host="0.0.0.0",
+            port=5000,
+            threads=16,
+            channel_timeout=3600,
+        )